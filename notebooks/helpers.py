@@ -1,18 +1,44 @@
 """
 Data-loading utilities for the DayDiff Vulnerability EDA.
 
-Each function opens a read-only connection to the SQLite database,
-runs a query scoped to vulnerability datasets, and returns a clean
+Each function borrows a pooled read-only connection to the SQLite
+database, runs a query scoped to vulnerability datasets, and returns a clean
 pandas DataFrame with JSON columns flattened where appropriate.
 """
 
+import hashlib
 import json
+import os
+import queue
 import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 
 import pandas as pd
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    import adbc_driver_sqlite.dbapi as adbc_sqlite
+except ImportError:
+    adbc_sqlite = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
 DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "data" / "daydiff.db"
+CACHE_DIR = Path.home() / ".cache" / "daydiff"
 
 # ── Severity colour palette (reused across all notebooks) ────────
 
@@ -29,109 +55,429 @@ STATUS_ORDER = ["detected", "in_progress", "resolved", "false_positive"]
 SCAN_TYPE_ORDER = ["sast", "sca", "dast", "kics"]
 
 
-def _connect(db_path=None):
-    path = str(db_path or DEFAULT_DB_PATH)
-    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
-    conn.row_factory = sqlite3.Row
+# Read-side tuning applied once per pooled connection. The DB is already in
+# WAL mode (set by the Node writer), so journal_mode is left alone here.
+_READ_PRAGMAS = (
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 1073741824",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _open(path, arrow=True):
+    uri = f"file:{path}?mode=ro"
+    if arrow and adbc_sqlite is not None:
+        conn = adbc_sqlite.connect(uri, autocommit=True)
+    else:
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    for pragma in _READ_PRAGMAS:
+        cur.execute(pragma)
+    cur.close()
     return conn
 
 
-def _flatten_row_data(df, col="row_data"):
-    """Parse a JSON text column into individual DataFrame columns."""
+@contextmanager
+def _connect(db_path=None, arrow=True):
+    """Borrow a read-only connection for ``db_path``; it returns to the pool on exit.
+
+    ``arrow=False`` forces a stdlib sqlite3 connection. ADBC infers each
+    column's type from the first batch and fails if a later row differs,
+    so queries whose column types can vary per row (``json_extract``, or
+    nullable TEXT columns that can be all NULL for a whole batch) must not
+    use it.
+    """
+    path = str(db_path or DEFAULT_DB_PATH)
+    arrow = arrow and adbc_sqlite is not None
+    with _pools_lock:
+        pool = _pools.setdefault((path, arrow), queue.SimpleQueue())
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _open(path, arrow)
+    try:
+        yield conn
+    finally:
+        pool.put(conn)
+
+
+def close_connections():
+    """Close every pooled connection (e.g. before replacing the DB file)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _read_sql(sql, conn, params=()):
+    """Run a query into a DataFrame.
+
+    ADBC connections hand back an Arrow table, skipping the per-row
+    Python tuples ``pd.read_sql_query`` builds from a sqlite3 cursor.
+    """
+    if adbc_sqlite is not None and isinstance(conn, adbc_sqlite.Connection):
+        with conn.cursor() as cur:
+            cur.execute(sql, params or None)
+            return cur.fetch_arrow_table().to_pandas()
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def _uniform_columns(records):
+    """Column lists for records that all share one schema, else ``None``.
+
+    Matches ``json_normalize(records, max_level=1)`` — nested objects become
+    ``parent.child`` columns after the scalar ones — but fills each column
+    with a single list comprehension instead of deep-copying every record.
+    Any key or nested-key mismatch returns ``None`` so the caller can fall
+    back to ``json_normalize``.
+    """
+    first = records[0]
+    keys = first.keys()
+    if any(r.keys() != keys for r in records):
+        return None
+    scalars, nested = {}, {}
+    for key in keys:
+        values = [r[key] for r in records]
+        if isinstance(first[key], dict):
+            sub_keys = first[key].keys()
+            if not all(isinstance(v, dict) and v.keys() == sub_keys for v in values):
+                return None
+            for sub in sub_keys:
+                nested[f"{key}.{sub}"] = [v[sub] for v in values]
+        elif any(isinstance(v, dict) for v in values):
+            return None
+        else:
+            scalars[key] = values
+    return {**scalars, **nested}
+
+
+def _pluck(records, column):
+    """Values at a dotted key path (``location.fileName``), ``None`` where absent."""
+    path = column.split(".")
+    values = []
+    for value in records:
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        values.append(value)
+    return values
+
+
+def _flatten_row_data(df, col="row_data", columns=None):
+    """Parse a JSON text column into individual DataFrame columns.
+
+    Nested objects are flattened one level deep (``location.fileName``);
+    anything deeper stays as a dict in that column. With ``columns`` only
+    those (dotted) keys are built and ``json_normalize`` is skipped.
+    """
     if col not in df.columns or df.empty:
         return df
 
-    parsed = df[col].apply(json.loads)
-    flat = pd.json_normalize(parsed)
-    flat.index = df.index
-    df = df.drop(columns=[col])
-    return pd.concat([df, flat], axis=1)
+    parsed = [_json_loads(s) for s in df[col].to_numpy()]
+    if columns is None:
+        columns = _uniform_columns(parsed)
+    else:
+        columns = {c: _pluck(parsed, c) for c in columns}
+    if columns is not None:
+        flat = pd.DataFrame(columns, index=df.index)
+    else:
+        flat = pd.json_normalize(parsed, max_level=1)
+        flat.index = df.index
+    # Insert the few metadata columns into the wide frame rather than
+    # concatenating, which would rebuild (and copy) every flattened block.
+    meta = df.drop(columns=[col])
+    for i, name in enumerate(meta.columns):
+        flat.insert(i, name, meta[name], allow_duplicates=True)
+    return flat
+
+
+def _ordered_categorical(series, order):
+    """Ordered categorical on ``order``; unexpected values are kept, sorted after it."""
+    extra = sorted(set(series.dropna().unique()) - set(order), key=str)
+    return series.astype(pd.CategoricalDtype(order + extra, ordered=True))
+
+
+def _native_dtypes(df):
+    """Swap Python-object columns for compact native dtypes in place.
+
+    ``severity`` / ``status`` become ordered categoricals, ``fetched_date``
+    a datetime, and integer id columns are downcast.
+    """
+    if "severity" in df.columns:
+        df["severity"] = _ordered_categorical(df["severity"], SEVERITY_ORDER)
+    if "status" in df.columns:
+        df["status"] = _ordered_categorical(df["status"], STATUS_ORDER)
+    if "fetched_date" in df.columns:
+        df["fetched_date"] = pd.to_datetime(df["fetched_date"])
+    for col in df.columns:
+        if (col == "id" or col.endswith(("Id", "_id"))) and pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
 
 
-# ── 1. Latest snapshot ───────────────────────────────────────────
+def _row_data_columns(fields=None):
+    """SELECT-list fragment (and bound params) for the snapshot row payload.
 
-def load_latest_snapshot(db_path=None):
-    """Load the most-recent vulnerability snapshot rows, one row per vuln.
+    With ``fields`` each one is pulled out by SQLite's ``json_extract`` as
+    its own column, so no JSON reaches pandas; otherwise the raw
+    ``row_data`` text is selected for ``_flatten_row_data``.
+    """
+    if fields is None:
+        return "sr.row_data", []
+    exprs = [
+        'json_extract(sr.row_data, ?) AS "{}"'.format(f.replace('"', '""'))
+        for f in fields
+    ]
+    return ",\n                ".join(exprs), [f"$.{f}" for f in fields]
+
+
+@lru_cache(maxsize=None)
+def _discover_row_fields(path):
+    with _connect(path) as conn:
+        df = _read_sql(
+            """
+            SELECT DISTINCT je.key
+            FROM snapshot_rows sr
+            JOIN snapshots s  ON s.id  = sr.snapshot_id
+            JOIN datasets  ds ON ds.id = s.dataset_id,
+                 json_each(sr.row_data) je
+            WHERE ds.category = 'vulnerability'
+            ORDER BY je.key
+            """,
+            conn,
+        )
+    return tuple(df["key"])
 
-    Returns a DataFrame with all JSON fields flattened into columns,
-    plus ``fetched_date`` and ``dataset_name`` metadata.
+
+def discover_row_fields(db_path=None):
+    """Top-level ``row_data`` keys across vulnerability snapshots.
+
+    Scans every row once, then is cached for the life of the process.
     """
-    conn = _connect(db_path)
-    df = pd.read_sql_query(
+    return list(_discover_row_fields(str(db_path or DEFAULT_DB_PATH)))
+
+
+# ── Parquet cache for the snapshot loaders ───────────────────────
+
+_JSON_COLUMNS_META = b"daydiff.json_columns"
+
+
+def _snapshot_cache_path(conn, loader, db_path, selection):
+    """Parquet path for ``loader``'s result on the current vulnerability data.
+
+    The name carries a digest of the newest fetch date, snapshot count, id,
+    summed row counts and creation time, plus the size and mtime of the DB
+    and its ``-wal`` file. A same-day re-run deletes and re-inserts the
+    snapshot under its old id, so the file stats are what catch a rewrite
+    within the same second. Returns ``None`` when pyarrow is not installed.
+    """
+    if pq is None:
+        return None
+    state = _read_sql(
         """
-        SELECT
-            sr.row_key,
-            sr.row_data,
-            s.fetched_date,
-            ds.name AS dataset_name
-        FROM snapshot_rows sr
-        JOIN snapshots s  ON s.id  = sr.snapshot_id
-        JOIN datasets  ds ON ds.id = s.dataset_id
+        SELECT MAX(s.fetched_date), COUNT(*), MAX(s.id), SUM(s.row_count), MAX(s.created_at)
+        FROM snapshots s
+        JOIN datasets ds ON ds.id = s.dataset_id
         WHERE ds.category = 'vulnerability'
-          AND s.fetched_date = (
-              SELECT MAX(s2.fetched_date)
-              FROM snapshots s2
-              JOIN datasets d2 ON d2.id = s2.dataset_id
-              WHERE d2.category = 'vulnerability'
-          )
         """,
         conn,
-    )
-    conn.close()
-    return _flatten_row_data(df)
+    ).iloc[0].tolist()
+    db = str(Path(db_path or DEFAULT_DB_PATH).resolve())
+    for f in (db, f"{db}-wal"):
+        try:
+            st = os.stat(f)
+            state += [st.st_size, st.st_mtime_ns]
+        except FileNotFoundError:
+            state += [None, None]
+    scope = hashlib.sha1(repr((db, selection)).encode()).hexdigest()[:12]
+    version = hashlib.sha1(repr([str(v) for v in state]).encode()).hexdigest()[:12]
+    return CACHE_DIR / f"{loader}-{scope}-{version}.parquet"
+
+
+def _read_cache(path):
+    """Cached frame at ``path``, or ``None`` on a miss.
+
+    An unreadable file (truncated, or left by an older writer) is deleted
+    and treated as a miss so the caller falls through to SQLite.
+    """
+    if not path.exists():
+        return None
+    try:
+        table = pq.read_table(path)
+        df = table.to_pandas()
+        for col in _json_loads((table.schema.metadata or {}).get(_JSON_COLUMNS_META, b"[]")):
+            df[col] = [None if v is None else _json_loads(v) for v in df[col].to_numpy()]
+    except (OSError, ValueError):
+        path.unlink(missing_ok=True)
+        return None
+    return df
+
+
+def _write_cache(path, df):
+    """Best-effort Parquet write; list/dict columns are stored as JSON text."""
+    json_cols = [
+        c for c in df.columns
+        if df[c].dtype == object and any(isinstance(v, (dict, list)) for v in df[c].to_numpy())
+    ]
+    out = df.copy()
+    for col in json_cols:
+        out[col] = [
+            None if v is None or (isinstance(v, float) and v != v) else json.dumps(v)
+            for v in out[col].to_numpy()
+        ]
+    try:
+        table = pa.Table.from_pandas(out, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), _JSON_COLUMNS_META: json.dumps(json_cols).encode()}
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for stale in path.parent.glob(path.name.rsplit("-", 1)[0] + "-*.parquet"):
+            stale.unlink(missing_ok=True)
+        # Write beside the target and rename, so an interrupted write or a
+        # concurrent reader never sees a partial file at ``path``.
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}-", suffix=".tmp")
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp, compression="zstd")
+            os.replace(tmp, path)
+        finally:
+            Path(tmp).unlink(missing_ok=True)
+    except (OSError, TypeError, ValueError):
+        # Mixed-type columns Arrow can't type, or an unwritable cache dir:
+        # skip caching, the loaded frame is still returned.
+        pass
+
+
+# ── 1. Latest snapshot ───────────────────────────────────────────
+
+# Resolved on its own so the row query binds a plain ``fetched_date = ?``
+# (planned once per pooled connection) instead of a correlated subquery.
+# The UNIQUE(dataset_id, fetched_date) index on snapshots serves the MAX.
+_LATEST_VULN_DATE_SQL = """
+    SELECT MAX(s.fetched_date) AS fetched_date
+    FROM snapshots s
+    JOIN datasets ds ON ds.id = s.dataset_id
+    WHERE ds.category = 'vulnerability'
+"""
+
+
+def load_latest_snapshot(db_path=None, fields=None, columns=None, cache=True):
+    """Load the most-recent vulnerability snapshot rows, one row per vuln.
+
+    Returns a DataFrame with all JSON fields flattened into columns,
+    plus ``fetched_date`` (datetime) and ``dataset_name`` metadata;
+    ``severity`` and ``status`` are ordered categoricals.
+
+    Pass ``fields`` (e.g. ``["severity", "status", "location.fileName"]``)
+    to have SQLite extract only those keys instead of parsing every blob,
+    or ``columns`` to parse in Python but build only those columns —
+    slower than ``fields`` but lists, booleans and objects keep their
+    JSON types.
+    Results are cached as Parquet under ``CACHE_DIR`` until the next
+    snapshot lands; ``cache=False`` always reads from SQLite.
+    """
+    if fields is not None and columns is not None:
+        raise ValueError("pass either fields or columns, not both")
+    row_cols, params = _row_data_columns(fields)
+    with _connect(db_path, arrow=fields is None) as conn:
+        cache_path = _snapshot_cache_path(conn, "latest_snapshot", db_path, (fields, columns)) if cache else None
+        cached = _read_cache(cache_path) if cache_path is not None else None
+        if cached is not None:
+            return cached
+        latest_date = _read_sql(_LATEST_VULN_DATE_SQL, conn).iloc[0, 0]
+        df = _read_sql(
+            f"""
+            SELECT
+                sr.row_key,
+                s.fetched_date,
+                ds.name AS dataset_name,
+                {row_cols}
+            FROM snapshot_rows sr
+            JOIN snapshots s  ON s.id  = sr.snapshot_id
+            JOIN datasets  ds ON ds.id = s.dataset_id
+            WHERE ds.category = 'vulnerability'
+              AND s.fetched_date = ?
+            """,
+            conn,
+            params=[*params, latest_date],
+        )
+    df = _native_dtypes(_flatten_row_data(df, columns=columns))
+    if cache_path is not None:
+        _write_cache(cache_path, df)
+    return df
 
 
 # ── 2. All snapshots (for temporal / per-date analysis) ──────────
 
-def load_all_snapshots(db_path=None):
+def load_all_snapshots(db_path=None, fields=None, columns=None, cache=True):
     """Load *every* vulnerability snapshot row across all dates.
 
     Useful for computing age distributions, cumulative open counts, etc.
-    Can be large — caller should filter/aggregate as needed.
+    Can be large — caller should filter/aggregate as needed, or pass
+    ``fields`` / ``columns`` as in :func:`load_latest_snapshot` (which
+    also describes ``cache``).
     """
-    conn = _connect(db_path)
-    df = pd.read_sql_query(
-        """
-        SELECT
-            sr.row_key,
-            sr.row_data,
-            s.fetched_date,
-            ds.name AS dataset_name
-        FROM snapshot_rows sr
-        JOIN snapshots s  ON s.id  = sr.snapshot_id
-        JOIN datasets  ds ON ds.id = s.dataset_id
-        WHERE ds.category = 'vulnerability'
-        ORDER BY s.fetched_date, ds.name
-        """,
-        conn,
-    )
-    conn.close()
-    return _flatten_row_data(df)
+    if fields is not None and columns is not None:
+        raise ValueError("pass either fields or columns, not both")
+    row_cols, params = _row_data_columns(fields)
+    with _connect(db_path, arrow=fields is None) as conn:
+        cache_path = _snapshot_cache_path(conn, "all_snapshots", db_path, (fields, columns)) if cache else None
+        cached = _read_cache(cache_path) if cache_path is not None else None
+        if cached is not None:
+            return cached
+        df = _read_sql(
+            f"""
+            SELECT
+                sr.row_key,
+                s.fetched_date,
+                ds.name AS dataset_name,
+                {row_cols}
+            FROM snapshot_rows sr
+            JOIN snapshots s  ON s.id  = sr.snapshot_id
+            JOIN datasets  ds ON ds.id = s.dataset_id
+            WHERE ds.category = 'vulnerability'
+            ORDER BY s.fetched_date, ds.name
+            """,
+            conn,
+            params=params,
+        )
+    df = _native_dtypes(_flatten_row_data(df, columns=columns))
+    if cache_path is not None:
+        _write_cache(cache_path, df)
+    return df
 
 
 # ── 3. Diff summaries (one row per dataset per day-pair) ─────────
 
 def load_diff_summaries(db_path=None):
     """Daily diff summary stats for trend / churn charts."""
-    conn = _connect(db_path)
-    df = pd.read_sql_query(
-        """
-        SELECT
-            d.from_date,
-            d.to_date,
-            d.added_count,
-            d.removed_count,
-            d.modified_count,
-            d.unchanged_count,
-            ds.name AS dataset_name
-        FROM diffs d
-        JOIN datasets ds ON ds.id = d.dataset_id
-        WHERE ds.category = 'vulnerability'
-        ORDER BY d.to_date, ds.name
-        """,
-        conn,
-    )
-    conn.close()
+    with _connect(db_path) as conn:
+        df = _read_sql(
+            """
+            SELECT
+                d.from_date,
+                d.to_date,
+                d.added_count,
+                d.removed_count,
+                d.modified_count,
+                d.unchanged_count,
+                ds.name AS dataset_name
+            FROM diffs d
+            JOIN datasets ds ON ds.id = d.dataset_id
+            WHERE ds.category = 'vulnerability'
+            ORDER BY d.to_date, ds.name
+            """,
+            conn,
+        )
     return df
 
 
@@ -143,35 +489,33 @@ def load_diff_items(db_path=None):
     Returns columns: row_key, change_type, row_data (flat), field_changes
     (dict), changed_fields (list), from_date, to_date, dataset_name.
     """
-    conn = _connect(db_path)
-    df = pd.read_sql_query(
-        """
-        SELECT
-            di.row_key,
-            di.change_type,
-            di.row_data,
-            di.field_changes,
-            di.changed_fields,
-            d.from_date,
-            d.to_date,
-            ds.name AS dataset_name
-        FROM diff_items di
-        JOIN diffs    d  ON d.id  = di.diff_id
-        JOIN datasets ds ON ds.id = d.dataset_id
-        WHERE ds.category = 'vulnerability'
-        ORDER BY d.to_date, ds.name
-        """,
-        conn,
-    )
-    conn.close()
+    # field_changes / changed_fields are NULL for added and removed items
+    with _connect(db_path, arrow=False) as conn:
+        df = _read_sql(
+            """
+            SELECT
+                di.row_key,
+                di.change_type,
+                di.row_data,
+                di.field_changes,
+                di.changed_fields,
+                d.from_date,
+                d.to_date,
+                ds.name AS dataset_name
+            FROM diff_items di
+            JOIN diffs    d  ON d.id  = di.diff_id
+            JOIN datasets ds ON ds.id = d.dataset_id
+            WHERE ds.category = 'vulnerability'
+            ORDER BY d.to_date, ds.name
+            """,
+            conn,
+        )
 
     if not df.empty:
-        df["field_changes"] = df["field_changes"].apply(
-            lambda x: json.loads(x) if pd.notna(x) else {}
-        )
-        df["changed_fields"] = df["changed_fields"].apply(
-            lambda x: json.loads(x) if pd.notna(x) else []
-        )
+        for col, empty in (("field_changes", dict), ("changed_fields", list)):
+            values = df[col].to_numpy()
+            present = pd.notna(values)
+            df[col] = [_json_loads(v) if ok else empty() for v, ok in zip(values, present)]
 
     return df
 
@@ -180,20 +524,19 @@ def load_diff_items(db_path=None):
 
 def load_population_trend(db_path=None):
     """Row counts per dataset per date — lightweight trend data."""
-    conn = _connect(db_path)
-    df = pd.read_sql_query(
-        """
-        SELECT
-            s.fetched_date,
-            s.row_count,
-            s.api_total,
-            ds.name AS dataset_name
-        FROM snapshots s
-        JOIN datasets ds ON ds.id = s.dataset_id
-        WHERE ds.category = 'vulnerability'
-        ORDER BY s.fetched_date, ds.name
-        """,
-        conn,
-    )
-    conn.close()
-    return df
+    with _connect(db_path) as conn:
+        df = _read_sql(
+            """
+            SELECT
+                s.fetched_date,
+                s.row_count,
+                s.api_total,
+                ds.name AS dataset_name
+            FROM snapshots s
+            JOIN datasets ds ON ds.id = s.dataset_id
+            WHERE ds.category = 'vulnerability'
+            ORDER BY s.fetched_date, ds.name
+            """,
+            conn,
+        )
+    return _native_dtypes(df)
@@ -0,0 +1,138 @@
+"""
+Regression checks for the notebook loaders in ``helpers.py``.
+
+Builds a throwaway SQLite DB from ``src/db/schema.sql``. Run from the
+project root with ``python -m pytest notebooks`` or
+``python -m unittest discover notebooks``.
+"""
+
+import json
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+NOTEBOOKS_DIR = Path(__file__).resolve().parent
+SCHEMA_PATH = NOTEBOOKS_DIR.parent / "src" / "db" / "schema.sql"
+sys.path.insert(0, str(NOTEBOOKS_DIR))
+
+import helpers  # noqa: E402
+
+# Well past one ADBC batch (1024 rows), so type inference sees only the ints.
+ROW_COUNT = 8000
+
+
+def build_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
+    conn.execute(
+        "INSERT INTO datasets (id, name, endpoint, row_key, category) "
+        "VALUES (1, 'vulns-test', '/vulnerabilities', 'id', 'vulnerability')"
+    )
+    conn.execute(
+        "INSERT INTO snapshots (id, dataset_id, fetched_date, row_count) VALUES (1, 1, '2026-01-01', ?)",
+        (len(rows),),
+    )
+    conn.executemany(
+        "INSERT INTO snapshot_rows (snapshot_id, row_key, row_data) VALUES (1, ?, ?)",
+        [(row["id"], json.dumps(row)) for row in rows],
+    )
+    conn.commit()
+    conn.close()
+
+
+class LoaderTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(helpers.close_connections)
+        self.db_path = Path(tmp.name) / "daydiff.db"
+        # Mixed INTEGER / REAL json_extract results across batches
+        rows = [
+            {"id": f"v{i}", "severity": "HIGH", "cvss": 7 if i < ROW_COUNT // 2 else 7.5}
+            for i in range(ROW_COUNT)
+        ]
+        build_db(self.db_path, rows)
+
+    def test_fields_with_mixed_int_and_real_values(self):
+        for loader in (helpers.load_latest_snapshot, helpers.load_all_snapshots):
+            df = loader(self.db_path, fields=["cvss"], cache=False)
+            self.assertEqual(len(df), ROW_COUNT)
+            self.assertEqual(df["cvss"].dtype.kind, "f")
+            cvss = dict(zip(df["row_key"], df["cvss"]))
+            self.assertEqual(cvss["v0"], 7.0)
+            self.assertEqual(cvss[f"v{ROW_COUNT - 1}"], 7.5)
+
+    def test_diff_items_with_leading_null_field_changes(self):
+        # added/removed items carry NULL field_changes; a full first batch of them
+        # must not pin the column type before the modified rows arrive.
+        changes = {"severity": {"old": "LOW", "new": "HIGH"}}
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute(
+                "INSERT INTO diffs (id, dataset_id, from_date, to_date) VALUES (1, 1, '2025-12-31', '2026-01-01')"
+            )
+            conn.executemany(
+                "INSERT INTO diff_items (diff_id, row_key, change_type, row_data, field_changes, changed_fields) "
+                "VALUES (1, ?, ?, ?, ?, ?)",
+                [(f"a{i}", "added", "{}", None, None) for i in range(2000)]
+                + [(f"m{i}", "modified", "{}", json.dumps(changes), '["severity"]') for i in range(5)],
+            )
+        conn.close()
+
+        df = helpers.load_diff_items(self.db_path)
+        self.assertEqual(len(df), 2005)
+        modified = df[df["change_type"] == "modified"]
+        self.assertEqual(list(modified["field_changes"]), [changes] * 5)
+        self.assertEqual(list(modified["changed_fields"]), [["severity"]] * 5)
+        self.assertEqual(df.loc[df["change_type"] == "added", "field_changes"].iloc[0], {})
+
+    @unittest.skipIf(helpers.pq is None, "pyarrow not installed")
+    def test_truncated_cache_file_is_a_miss(self):
+        cache_dir = self.db_path.parent / "cache"
+        original_cache_dir = helpers.CACHE_DIR
+        helpers.CACHE_DIR = cache_dir
+        self.addCleanup(setattr, helpers, "CACHE_DIR", original_cache_dir)
+
+        expected = helpers.load_latest_snapshot(self.db_path)
+        (cache_file,) = cache_dir.glob("*.parquet")
+        cache_file.write_bytes(cache_file.read_bytes()[:100])
+
+        df = helpers.load_latest_snapshot(self.db_path)
+        self.assertTrue(df.equals(expected))
+        self.assertTrue(helpers.load_latest_snapshot(self.db_path).equals(expected))
+        self.assertEqual([p.name for p in cache_dir.iterdir()], [cache_file.name])
+
+    @unittest.skipIf(helpers.pq is None, "pyarrow not installed")
+    def test_rewritten_snapshot_is_a_cache_miss(self):
+        cache_dir = self.db_path.parent / "cache"
+        original_cache_dir = helpers.CACHE_DIR
+        helpers.CACHE_DIR = cache_dir
+        self.addCleanup(setattr, helpers, "CACHE_DIR", original_cache_dir)
+
+        df = helpers.load_latest_snapshot(self.db_path)
+        self.assertEqual(set(df["severity"]), {"HIGH"})
+
+        # Same-day re-run: delete and re-insert, as insertSnapshot does. Without
+        # AUTOINCREMENT the snapshot gets its old id back, with the same row count.
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute("DELETE FROM snapshot_rows WHERE snapshot_id = 1")
+            conn.execute("DELETE FROM snapshots WHERE id = 1")
+            conn.execute(
+                "INSERT INTO snapshots (dataset_id, fetched_date, row_count) VALUES (1, '2026-01-01', ?)",
+                (ROW_COUNT,),
+            )
+            conn.executemany(
+                "INSERT INTO snapshot_rows (snapshot_id, row_key, row_data) VALUES (1, ?, ?)",
+                [(f"v{i}", json.dumps({"id": f"v{i}", "severity": "LOW"})) for i in range(ROW_COUNT)],
+            )
+        conn.close()
+
+        df = helpers.load_latest_snapshot(self.db_path)
+        self.assertEqual(set(df["severity"]), {"LOW"})
+
+
+if __name__ == "__main__":
+    unittest.main()
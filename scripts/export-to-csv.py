@@ -3,7 +3,8 @@
 Daydiff API Export to CSV (Standalone)
 
 Fetches the same DevGrid API data as daydiff and writes one CSV per dataset.
-No npm/Node required. Uses Python stdlib only.
+No npm/Node required. Uses Python stdlib only (urllib3 and orjson are used
+if installed).
 
 Usage:
   python3 export-to-csv.py
@@ -19,12 +20,38 @@ import csv
 import json
 import os
 import re
+import ssl
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from urllib.error import HTTPError, URLError
 from urllib.parse import urlencode, urljoin
-from urllib.request import Request, urlopen, build_opener, HTTPSHandler, ProxyHandler, install_opener
+from urllib.request import Request, build_opener, HTTPSHandler, ProxyHandler
+
+try:
+    import urllib3
+    from urllib3.util.retry import Retry
+except ImportError:
+    urllib3 = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data):
+    """Parse JSON from str or bytes (orjson when available)."""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def json_dumps(value):
+    """Compact, non-ASCII-preserving JSON string; same output with or without orjson."""
+    if orjson:
+        return orjson.dumps(value).decode()
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
 
 # ─── Embedded config (synced from config/datasets.mjs + config/assets.mjs) ───
 
@@ -33,6 +60,9 @@ VULN_PAGE_SIZE = 250
 VULN_SEVERITIES = ["CRITICAL", "HIGH", "MEDIUM", "LOW", "INFO"]
 MAX_ITERATIONS = 2000
 OVERLAP_RATIO = 0.25
+FETCH_WORKERS = 8  # concurrent page / partition requests per dataset
+RETRY_ATTEMPTS = 5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
 
 PLATFORM_DATASETS = [
     {"name": "Applications", "endpoint": "/applications", "params": {"limit": PLATFORM_PAGE_SIZE}},
@@ -42,6 +72,10 @@ PLATFORM_DATASETS = [
     {"name": "Portfolios", "endpoint": "/entities", "params": {"type": "portfolio", "limit": PLATFORM_PAGE_SIZE}},
 ]
 
+# Match { name: '...', vulnerableId: '...' } or "..." variants
+ASSET_PATTERN = re.compile(r"\{\s*name:\s*['\"]([^'\"]*)['\"],\s*vulnerableId:\s*['\"]([^'\"]*)['\"]")
+
+
 def try_load_assets_from_mjs():
     """If run from daydiff repo, parse config/assets.mjs; else return None."""
     repo_root = Path(__file__).resolve().parent.parent
@@ -50,9 +84,7 @@ def try_load_assets_from_mjs():
         return None
     text = mjs_path.read_text(encoding="utf-8")
     assets = []
-    # Match { name: '...', vulnerableId: '...' } or "..." variants
-    pattern = r"\{\s*name:\s*['\"]([^'\"]*)['\"],\s*vulnerableId:\s*['\"]([^'\"]*)['\"]"
-    for m in re.finditer(pattern, text):
+    for m in ASSET_PATTERN.finditer(text):
         assets.append({"name": m.group(1), "vulnerableId": m.group(2)})
     return assets if assets else None
 
@@ -65,6 +97,10 @@ ASSETS = [
 ]
 
 
+# KEY=value per line, surrounding whitespace trimmed. Lines starting with # are skipped.
+ENV_LINE_PATTERN = re.compile(r"^[ \t]*([^#\s=][^=\n]*?)[ \t]*=[ \t]*(.*?)[ \t]*\r?$", re.MULTILINE)
+
+
 def load_env(env_path=None):
     """Load .env into os.environ. No external deps."""
     path = env_path or Path(__file__).resolve().parent.parent / ".env"
@@ -72,13 +108,9 @@ def load_env(env_path=None):
         path = Path.cwd() / ".env"
     if not Path(path).exists():
         return None
-    with open(path, encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith("#") and "=" in line:
-                k, v = line.split("=", 1)
-                v = v.strip().strip('"').strip("'")
-                os.environ.setdefault(k.strip(), v)
+    text = Path(path).read_text(encoding="utf-8")
+    for key, value in ENV_LINE_PATTERN.findall(text):
+        os.environ.setdefault(key, value.strip('"').strip("'"))
     return str(path)
 
 
@@ -86,46 +118,85 @@ def load_config(config_path):
     """Load JSON config with optional assets and datasets toggle map."""
     data = {}
     if config_path and Path(config_path).exists():
-        with open(config_path, encoding="utf-8") as f:
-            data = json.load(f)
+        data = json_loads(Path(config_path).read_bytes())
     return data
 
 
-def api_request(base_url, api_key, path, params=None, proxy_url=None, ca_path=None, strict_ssl=True):
-    """GET request with retry on 429/5xx."""
-    url = urljoin(base_url.rstrip("/") + "/", path.lstrip("/"))
-    if params:
-        url += "?" + urlencode({k: v for k, v in params.items() if v is not None})
-    headers = {"Accept": "application/json", "Content-Type": "application/json", "x-api-key": api_key}
-    req = Request(url, headers=headers, method="GET")
+SSL_HINT = (
+    "[api] SSL certificate verification failed. In .env set:\n"
+    "  CA_CERT_PATH=/path/to/corporate-ca-bundle.pem  (if behind TLS-inspecting proxy)\n"
+    "  or STRICT_SSL=false  (last resort, disables verification)"
+)
+
+
+if urllib3 is not None:
+
+    class LoggingRetry(Retry):
+        """urllib3 Retry that reports each retry like the stdlib path does."""
+
+        def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+            new_retry = super().increment(method, url, response, error, _pool, _stacktrace)
+            reason = response.status if response is not None else error
+            print(f"[api] {reason} {url}, retry {len(new_retry.history)}/{RETRY_ATTEMPTS}", file=sys.stderr)
+            return new_retry
+
+
+@lru_cache(maxsize=None)
+def get_pool(proxy_url=None, ca_path=None, strict_ssl=True):
+    """Shared, thread-safe urllib3 pool per proxy/TLS setting (keep-alive + retry/backoff)."""
+    kwargs = {
+        "maxsize": FETCH_WORKERS * 2,
+        "retries": LoggingRetry(total=RETRY_ATTEMPTS, backoff_factor=0.5, status_forcelist=RETRY_STATUSES),
+    }
+    if ca_path and Path(ca_path).exists():
+        kwargs["ca_certs"] = ca_path
+    elif not strict_ssl:
+        kwargs["cert_reqs"] = "CERT_NONE"
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    if proxy_url:
+        return urllib3.ProxyManager(proxy_url, **kwargs)
+    return urllib3.PoolManager(**kwargs)
 
+
+@lru_cache(maxsize=None)
+def get_opener(proxy_url=None, ca_path=None, strict_ssl=True):
+    """Build one opener per proxy/TLS setting. Never installed globally, so safe across threads."""
     handlers = []
     if proxy_url:
         handlers.append(ProxyHandler({"http": proxy_url, "https": proxy_url}))
     if ca_path and Path(ca_path).exists():
-        import ssl
         ctx = ssl.create_default_context(cafile=ca_path)
         handlers.append(HTTPSHandler(context=ctx))
     elif not strict_ssl:
-        import ssl
         ctx = ssl.create_default_context()
         ctx.check_hostname = False
         ctx.verify_mode = ssl.CERT_NONE
         handlers.append(HTTPSHandler(context=ctx))
-    if handlers:
-        opener = build_opener(*handlers)
-        install_opener(opener)
+    return build_opener(*handlers)
+
+
+def api_request(base_url, api_key, path, params=None, proxy_url=None, ca_path=None, strict_ssl=True):
+    """GET request with retry on 429/5xx (pooled via urllib3 when installed)."""
+    url = urljoin(base_url.rstrip("/") + "/", path.lstrip("/"))
+    if params:
+        url += "?" + urlencode({k: v for k, v in params.items() if v is not None})
+    headers = {"Accept": "application/json", "Content-Type": "application/json", "x-api-key": api_key}
+    if urllib3 is not None:
+        return pooled_get(url, headers, proxy_url, ca_path, strict_ssl)
+
+    req = Request(url, headers=headers, method="GET")
+    opener = get_opener(proxy_url, ca_path, strict_ssl)
 
     last_err = None
-    for attempt in range(5):
+    for attempt in range(RETRY_ATTEMPTS):
         try:
-            with urlopen(req, timeout=60) as resp:
-                return json.loads(resp.read().decode())
+            with opener.open(req, timeout=60) as resp:
+                return json_loads(resp.read())
         except HTTPError as e:
             last_err = e
-            if e.code in (429, 500, 502, 503, 504):
+            if e.code in RETRY_STATUSES:
                 delay = 500 * (2 ** attempt) / 1000
-                print(f"[api] {e.code} {path}, retry {attempt + 1}/5 in {delay:.1f}s", file=sys.stderr)
+                print(f"[api] {e.code} {path}, retry {attempt + 1}/{RETRY_ATTEMPTS} in {delay:.1f}s", file=sys.stderr)
                 time.sleep(delay)
             else:
                 raise
@@ -133,19 +204,28 @@ def api_request(base_url, api_key, path, params=None, proxy_url=None, ca_path=No
             last_err = e
             err_str = str(e).lower()
             if "ssl" in err_str or "certificate" in err_str:
-                print(
-                    "[api] SSL certificate verification failed. In .env set:\n"
-                    "  CA_CERT_PATH=/path/to/corporate-ca-bundle.pem  (if behind TLS-inspecting proxy)\n"
-                    "  or STRICT_SSL=false  (last resort, disables verification)",
-                    file=sys.stderr,
-                )
+                print(SSL_HINT, file=sys.stderr)
                 raise
             delay = 500 * (2 ** attempt) / 1000
-            print(f"[api] {e}, retry {attempt + 1}/5 in {delay:.1f}s", file=sys.stderr)
+            print(f"[api] {e}, retry {attempt + 1}/{RETRY_ATTEMPTS} in {delay:.1f}s", file=sys.stderr)
             time.sleep(delay)
     raise last_err
 
 
+def pooled_get(url, headers, proxy_url=None, ca_path=None, strict_ssl=True):
+    """GET through the shared urllib3 pool; retries/backoff are handled by its Retry."""
+    pool = get_pool(proxy_url, ca_path, strict_ssl)
+    try:
+        resp = pool.request("GET", url, headers=headers, timeout=60)
+    except urllib3.exceptions.MaxRetryError as e:
+        if isinstance(e.reason, urllib3.exceptions.SSLError):
+            print(SSL_HINT, file=sys.stderr)
+        raise
+    if resp.status >= 400:
+        raise HTTPError(url, resp.status, resp.reason, resp.headers, None)
+    return json_loads(resp.data)
+
+
 def extract_rows(body):
     """Extract data array from DevGrid response."""
     if isinstance(body, list):
@@ -155,20 +235,33 @@ def extract_rows(body):
     raise ValueError("Cannot extract rows from response")
 
 
+PAGINATION_TOTAL_KEYS = ("total", "totalCount", "count")
+PAGINATION_PAGE_SIZE_KEYS = ("limit", "pageSize", "per_page")
+
+
+def first_present(mapping, keys, default=0):
+    """Value of the first key that is present and not None (so 0 is kept)."""
+    return next((mapping[k] for k in keys if mapping.get(k) is not None), default)
+
+
 def extract_pagination(body):
     """Extract pagination metadata."""
     pag = (body or {}).get("pagination") or (body or {}).get("meta")
     if not pag:
         return None
     return {
-        "total": pag.get("total") or pag.get("totalCount") or pag.get("count") or 0,
-        "pageSize": pag.get("limit") or pag.get("pageSize") or pag.get("per_page") or 0,
+        "total": first_present(pag, PAGINATION_TOTAL_KEYS),
+        "pageSize": first_present(pag, PAGINATION_PAGE_SIZE_KEYS),
         "offset": pag.get("offset"),
     }
 
 
 def fetch_platform_dataset(base_url, api_key, name, endpoint, params, proxy, ca_path, strict_ssl):
-    """Fetch a single platform dataset (paginated, overlap stride)."""
+    """Fetch a single platform dataset (paginated, overlap stride).
+
+    The first page yields the total; remaining offsets are then fetched
+    concurrently and appended in offset order.
+    """
     all_rows = []
     first_params = dict(params)
     body = api_request(base_url, api_key, endpoint, first_params, proxy, ca_path, strict_ssl)
@@ -187,80 +280,139 @@ def fetch_platform_dataset(base_url, api_key, name, endpoint, params, proxy, ca_
     stride = max(1, int(page_size * (1 - OVERLAP_RATIO)))
     print(f"[fetch] {name}: {total} total, page size {page_size}")
 
-    current_offset = page_size
-    iteration = 1
-    while current_offset < total and iteration < MAX_ITERATIONS:
-        page_params = {**params, "offset": current_offset}
+    offsets = list(range(page_size, total, stride))[:MAX_ITERATIONS - 1]
+
+    def fetch_page(offset):
+        page_params = {**params, "offset": offset}
         try:
             page_body = api_request(base_url, api_key, endpoint, page_params, proxy, ca_path, strict_ssl)
-            page_rows = extract_rows(page_body)
-            if not page_rows:
-                break
+            return offset, extract_rows(page_body), None
+        except Exception as e:
+            return offset, [], e
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        for iteration, (offset, page_rows, err) in enumerate(pool.map(fetch_page, offsets), start=1):
+            if err is not None:
+                print(f"[fetch] {name}: page at offset {offset} failed ({err})", file=sys.stderr)
+                continue
             all_rows.extend(page_rows)
             if iteration % 10 == 0:
-                print(f"[fetch] {name}: ~{len(all_rows)}/{total} (offset {current_offset})")
-            if len(page_rows) < page_size:
-                break
-            current_offset += stride
-            iteration += 1
-        except Exception as e:
-            print(f"[fetch] {name}: pagination failed ({e}), got {len(all_rows)}/{total}", file=sys.stderr)
-            break
+                print(f"[fetch] {name}: ~{len(all_rows)}/{total} (offset {offset})")
 
     return all_rows
 
 
 def fetch_vulnerability_dataset(base_url, api_key, name, vulnerable_id, proxy, ca_path, strict_ssl):
-    """Fetch vulnerability dataset: partition by severity, 2 passes, dedupe by id."""
-    merged = {}
-    for severity in VULN_SEVERITIES:
-        for pass_num in range(1, 3):
-            params = {"vulnerableId": vulnerable_id, "severity": severity, "limit": VULN_PAGE_SIZE}
-            body = api_request(base_url, api_key, "/vulnerabilities", params, proxy, ca_path, strict_ssl)
-            rows = extract_rows(body)
+    """Fetch vulnerability dataset: partition by severity, 2 passes, dedupe by id.
+
+    All severity x pass requests run concurrently. Rows are yielded as each
+    partition arrives (in task order), so only ids are held for dedupe.
+    """
+    tasks = [(severity, pass_num) for severity in VULN_SEVERITIES for pass_num in range(1, 3)]
+
+    def fetch_partition(task):
+        severity, _pass_num = task
+        params = {"vulnerableId": vulnerable_id, "severity": severity, "limit": VULN_PAGE_SIZE}
+        body = api_request(base_url, api_key, "/vulnerabilities", params, proxy, ca_path, strict_ssl)
+        return extract_rows(body)
+
+    seen = set()
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        for rows in pool.map(fetch_partition, tasks):
             for row in rows:
                 rid = row.get("id")
-                if rid:
-                    merged[rid] = row
-            if not rows:
-                break
-    return list(merged.values())
-
-
-def flatten_row(row):
-    """Flatten row for CSV: nested objects → JSON string."""
-    out = {}
-    for k, v in row.items():
-        if v is None:
-            out[k] = ""
-        elif isinstance(v, (dict, list)):
-            out[k] = json.dumps(v)
-        else:
-            out[k] = str(v)
-    return out
+                if rid and rid not in seen:
+                    seen.add(rid)
+                    yield row
+
+
+def csv_cell(value):
+    """CSV cell value: nested objects → JSON string, None → empty."""
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return json_dumps(value)
+    return str(value)
+
+
+UNSAFE_FILENAME_RE = re.compile(r"[^\w\-_.]")
+# ASCII translate table equivalent to UNSAFE_FILENAME_RE (\w == isalnum() or "_")
+SAFE_FILENAME_TABLE = {i: "_" for i in range(128) if not (chr(i).isalnum() or chr(i) in "-_.")}
 
 
 def sanitize_filename(name):
     """Replace unsafe chars for filename."""
-    return re.sub(r'[^\w\-_.]', '_', name)[:100]
+    if name.isascii():
+        return name.translate(SAFE_FILENAME_TABLE)[:100]
+    return UNSAFE_FILENAME_RE.sub("_", name)[:100]
 
 
 def write_csv(path, rows):
     """Write rows to CSV with RFC 4180 escaping."""
     if not rows:
         return
-    flattened = [flatten_row(r) for r in rows]
-    keys = list(flattened[0].keys())  # preserve order from first row
+    flattened = [{k: csv_cell(v) for k, v in r.items()} for r in rows]
+    keys = dict.fromkeys(flattened[0])  # ordered set; preserve order from first row
     for r in flattened[1:]:
-        for k in r:
-            if k not in keys:
-                keys.append(k)
+        if not r.keys() <= keys.keys():
+            keys.update(dict.fromkeys(r))
+    keys = list(keys)
     with open(path, "w", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=keys, extrasaction="ignore")
         w.writeheader()
         w.writerows(flattened)
 
 
+def write_csv_stream(path, rows):
+    """Write rows to CSV as they are produced; returns the number written.
+
+    The header comes from the first row. A key first seen on a later row is
+    appended to the columns, and the file is rewritten once at the end with
+    the full header. Output goes to a .part file until complete; on error it
+    is removed and the exception re-raised.
+    """
+    part = Path(f"{path}.part")
+    full = Path(f"{path}.part.full")
+    try:
+        keys = {}
+        count = 0
+        with open(part, "w", newline="", encoding="utf-8") as f:
+            w = None
+            for row in rows:
+                cells = {k: csv_cell(v) for k, v in row.items()}
+                if w is None or not cells.keys() <= keys.keys():
+                    keys.update(dict.fromkeys(cells))
+                    w = csv.DictWriter(f, fieldnames=list(keys), extrasaction="ignore")
+                    if count == 0:
+                        w.writeheader()
+                w.writerow(cells)
+                count += 1
+
+        if count == 0:
+            part.unlink()
+            return 0
+        with open(part, newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f))
+        if len(header) == len(keys):
+            part.replace(path)
+            return count
+
+        with open(part, newline="", encoding="utf-8") as src, open(full, "w", newline="", encoding="utf-8") as dst:
+            reader = csv.reader(src)
+            next(reader)
+            w = csv.writer(dst)
+            w.writerow(list(keys))
+            for record in reader:
+                w.writerow(record + [""] * (len(keys) - len(record)))
+        full.replace(path)
+        part.unlink()
+        return count
+    except BaseException:
+        part.unlink(missing_ok=True)
+        full.unlink(missing_ok=True)
+        raise
+
+
 def build_datasets(assets, config_datasets=None):
     """Build full dataset list with toggles."""
     datasets = []
@@ -360,8 +512,8 @@ def main():
             proxy, ca_path, strict_ssl
         )
         path = Path(out_dir) / f"{sanitize_filename(ds['name'])}.csv"
-        write_csv(path, rows)
-        print(f"[fetch] {ds['name']}: wrote {len(rows)} rows to {path}\n")
+        count = write_csv_stream(path, rows)
+        print(f"[fetch] {ds['name']}: wrote {count} rows to {path}\n")
 
     print(f"[fetch] Complete. Output in {out_dir}")
 